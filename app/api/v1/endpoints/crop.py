@@ -1,12 +1,173 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from app.models.schemas import CropSubmitRequest, JobResponse, CropResult
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional, Tuple
+from app.models.schemas import (
+    CropSubmitRequest, JobResponse, CropResult, SequenceSubmitRequest, SequenceStatus
+)
 from app.core.celery_app import celery_app # Import from the correct central location
-import uuid
+from app.core.config import settings
+from app.services.cache_service import (
+    JobKeyBuilder, cache_service, status_body, status_payload, status_view, svg_body, svg_view
+)
+from app.services.svg_generator import SVGGenerator
+from app.utils.geometry_utils import select_detail_level
+from app.utils.http_utils import IDENTITY, compress, encoded_etag, etag_matches, negotiate_encoding
+from app.workers.signatures import submit_face_segmentation, submit_face_sequence
 import hashlib
+import orjson
 from rich.console import Console
 
 console = Console()
 router = APIRouter()
+svg_generator = SVGGenerator()
+
+
+def resolve_level(level: Optional[str]) -> str:
+    """Validate a requested level of detail, defaulting to CONTOUR_DEFAULT_LEVEL"""
+    if level is None:
+        return settings.CONTOUR_DEFAULT_LEVEL
+    if level not in settings.CONTOUR_DETAIL_LEVELS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown detail level '{level}'. Available levels: {', '.join(settings.CONTOUR_DETAIL_LEVELS)}."
+        )
+    return level
+
+
+def render_detail_level(result_data: dict, level: str) -> dict:
+    """
+    Return the SVG and contours of a completed job at the requested level of detail.
+    
+    Non-default levels are derived from the ranked contours stored with the job,
+    so switching levels never sends the job back to the worker.
+    """
+    if level == settings.CONTOUR_DEFAULT_LEVEL:
+        return status_payload(result_data["svg"], result_data["mask_contours"], level)
+    
+    stored_levels = result_data.get("contour_levels")
+    if not stored_levels or "image_shape" not in result_data:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This job was processed without detail levels; only the default level is available."
+        )
+    
+    mask_contours = select_detail_level(
+        stored_levels["contours"], stored_levels["ranks"], settings.CONTOUR_DETAIL_LEVELS[level]
+    )
+    return status_payload(
+        svg_generator.generate_svg(tuple(result_data["image_shape"]), mask_contours),
+        mask_contours,
+        level
+    )
+
+
+def rendered_headers(request: Request, etag: str, size: int) -> Tuple[str, dict]:
+    """Pick the content-coding for a stored view and build its caching headers"""
+    encoding = IDENTITY
+    if size >= settings.COMPRESSION_MIN_BYTES:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": encoded_etag(etag, encoding),
+        "Cache-Control": "no-cache",  # Clients may store it but must revalidate
+        "Vary": "Accept-Encoding"
+    }
+    return encoding, headers
+
+
+def encoded_response(body: bytes, encoding: str, media_type: str, headers: dict) -> Response:
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def rendered_response(
+    request: Request, job_id: str, view: str, media_type: str
+) -> Optional[Response]:
+    """
+    Serve a pre-serialized view straight from the cache, or None on a cache miss.
+    
+    Repeat polls that send the current ETag in If-None-Match get an empty 304,
+    and large bodies are sent in the best content-coding the client accepts.
+    """
+    meta = cache_service.get_rendered_meta(job_id, view)
+    if meta is None:
+        return None
+    etag, size = meta
+    encoding, headers = rendered_headers(request, etag, size)
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    body = cache_service.get_rendered_body(job_id, view, encoding)
+    if body is None:  # Expired between the two lookups
+        return None
+    return encoded_response(body, encoding, media_type, headers)
+
+
+def store_and_respond(
+    request: Request, job_id: str, view: str, body: bytes, media_type: str
+) -> Response:
+    """
+    Cache a freshly rendered view for later polls and serve this request from
+    the same bytes, so it never depends on reading the cache entry back.
+    """
+    etag, size = cache_service.store_rendered(job_id, view, body)
+    encoding, headers = rendered_headers(request, etag, size)
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return encoded_response(compress(body, encoding), encoding, media_type, headers)
+
+
+def crop_job_id(request: CropSubmitRequest) -> str:
+    """Derive the job ID from the decoded inputs, so identical uploads share a job"""
+    return (
+        JobKeyBuilder("crop")
+        .add_image(request.image)
+        .add_landmarks(request.landmarks)
+        .add_image(request.segmentation_map)
+        .job_id()
+    )
+
+
+def sequence_job_id(request: SequenceSubmitRequest) -> str:
+    """Derive the job ID of a frame sequence from its decoded frames and options"""
+    builder = JobKeyBuilder("sequence").add_json({
+        "landmark_tolerance": request.landmark_tolerance,
+        "change_threshold": request.change_threshold,
+        "frames": len(request.frames)
+    })
+    for frame in request.frames:
+        builder.add_image(frame.image).add_landmarks(frame.landmarks).add_image(frame.segmentation_map)
+    return builder.job_id()
+
+
+def coalesce_or_submit(job_id: str, job_data: dict, submit) -> JobResponse:
+    """
+    Single-flight submission: only the request that claims the job ID enqueues it.
+    
+    Retries and concurrent uploads of the same inputs get the existing job back
+    instead of queueing duplicate work.
+    """
+    if not cache_service.claim_job(job_id):
+        state = celery_app.AsyncResult(job_id).state
+        console.print(f"[bold cyan]Job {job_id} already exists ({state.lower()}); reusing it.[/bold cyan]")
+        return JobResponse(id=job_id, status=state.lower())
+    
+    try:
+        # A resubmitted failure reuses the failed job's ID; drop its old result
+        # so /status reports the new job as pending instead of failed
+        celery_app.AsyncResult(job_id).forget()
+        submit(job_data, task_id=job_id)
+    except Exception:
+        # Let the next identical request try again instead of waiting for the claim to expire
+        cache_service.release_job(job_id)
+        raise
+    
+    console.print(f"[bold yellow]Submitted job {job_id} to the queue.[/bold yellow]")
+    
+    return JobResponse(id=job_id, status="pending")
 
 
 @router.post("/submit", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
@@ -15,7 +176,15 @@ async def submit_crop_job(request: CropSubmitRequest):
     Submit a face segmentation job for asynchronous processing.
     """
     try:
-        job_id = str(uuid.uuid4())
+        # Hashing decodes every image, so keep it (and the Redis/broker calls) off the event loop
+        job_id = await run_in_threadpool(crop_job_id, request)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid base64 payload."
+        )
+    
+    try:
         image_hash = hashlib.md5(request.image.encode()).hexdigest()
         
         job_data = {
@@ -24,15 +193,8 @@ async def submit_crop_job(request: CropSubmitRequest):
             "image_hash": image_hash
         }
         
-        # In a real system with a DB, we would check the cache here.
-        # For now, we always queue the job.
-        
-        from app.workers.celery_worker import process_face_segmentation
-        process_face_segmentation.apply_async(args=[job_data], task_id=job_id)
-        
-        console.print(f"[bold yellow]Submitted job {job_id} to the queue.[/bold yellow]")
-        
-        return JobResponse(id=job_id, status="pending")
+        # Dispatch by task name so the API process never loads the worker stack.
+        return await run_in_threadpool(coalesce_or_submit, job_id, job_data, submit_face_segmentation)
         
     except Exception as e:
         console.print(f"[bold red]Error submitting job: {str(e)}[/bold red]")
@@ -42,12 +204,22 @@ async def submit_crop_job(request: CropSubmitRequest):
         )
 
 
-@router.get("/status/{job_id}")
-async def get_job_status(job_id: str):
+@router.get("/status/{job_id}", responses={200: {"model": CropResult}, 304: {"description": "Not modified"}})
+async def get_job_status(request: Request, job_id: str, level: Optional[str] = None):
     """
     Get the status and result of a processing job.
+    
+    Completed jobs can be fetched at any configured level of detail
+    (e.g. `?level=coarse` for thumbnails, `?level=fine` for editors).
+    Completed results are served pre-serialized with an ETag.
     """
+    level = resolve_level(level)
     try:
+        # Fast path: finished jobs are served from cached bytes without touching Celery
+        cached = rendered_response(request, job_id, status_view(level), "application/json")
+        if cached is not None:
+            return cached
+        
         task = celery_app.AsyncResult(job_id)
 
         if task.state == 'PENDING':
@@ -59,7 +231,12 @@ async def get_job_status(job_id: str):
             # The result of the task is stored in task.result
             result_data = task.result
             if result_data and "svg" in result_data and "mask_contours" in result_data:
-                return CropResult(**result_data)
+                # Serialize once (the worker's output is trusted, so no re-validation)
+                # and let every later poll take the fast path
+                return store_and_respond(
+                    request, job_id, status_view(level),
+                    status_body(render_detail_level(result_data, level)), "application/json"
+                )
             else:
                 # This can happen if the task succeeded but returned an unexpected format
                 raise HTTPException(
@@ -79,9 +256,147 @@ async def get_job_status(job_id: str):
         else: # Other states like 'STARTED', 'RETRY'
             return JobResponse(id=job_id, status=task.state.lower())
 
+    except HTTPException:
+        raise
     except Exception as e:
         console.print(f"[bold red]Error getting job status for {job_id}: {str(e)}[/bold red]")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error occurred while fetching the job status."
         )
+
+
+@router.get("/svg/{job_id}", response_class=Response)
+async def get_job_svg(request: Request, job_id: str, level: Optional[str] = None):
+    """
+    Get the SVG overlay of a completed job as an image, at an optional level of detail.
+    """
+    level = resolve_level(level)
+    try:
+        cached = rendered_response(request, job_id, svg_view(level), "image/svg+xml")
+        if cached is not None:
+            return cached
+        
+        task = celery_app.AsyncResult(job_id)
+
+        if task.state == 'FAILURE':
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Job failed: {str(task.info)}"
+            )
+        
+        if task.state != 'SUCCESS':
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Job is not completed yet (status: {task.state.lower()})."
+            )
+        
+        result_data = task.result
+        if not result_data or "svg" not in result_data:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Task succeeded but result is invalid."
+            )
+        
+        return store_and_respond(
+            request, job_id, svg_view(level),
+            svg_body(render_detail_level(result_data, level)["svg"]), "image/svg+xml"
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        console.print(f"[bold red]Error getting SVG for {job_id}: {str(e)}[/bold red]")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while fetching the job SVG."
+        )
+
+
+@router.post("/sequence/submit", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_sequence_job(request: SequenceSubmitRequest):
+    """
+    Submit an ordered frame sequence of the same face for asynchronous processing.
+    """
+    if len(request.frames) > settings.SEQUENCE_MAX_FRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A sequence may contain at most {settings.SEQUENCE_MAX_FRAMES} frames."
+        )
+    
+    try:
+        # Up to SEQUENCE_MAX_FRAMES * 2 images are decoded here, so not on the event loop
+        job_id = await run_in_threadpool(sequence_job_id, request)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid base64 payload."
+        )
+    
+    try:
+        job_data = {
+            "job_id": job_id,
+            "request": request.dict()
+        }
+        
+        return await run_in_threadpool(coalesce_or_submit, job_id, job_data, submit_face_sequence)
+        
+    except Exception as e:
+        console.print(f"[bold red]Error submitting sequence job: {str(e)}[/bold red]")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while submitting the job."
+        )
+
+
+@router.get("/sequence/status/{job_id}", response_model=SequenceStatus)
+async def get_sequence_status(job_id: str, since: int = Query(0, ge=0)):
+    """
+    Get the status of a sequence job and every frame finished so far.
+    
+    Frames are published as they complete, so clients can poll with
+    `since` set to the number of frames already received.
+    """
+    try:
+        task = celery_app.AsyncResult(job_id)
+
+        if task.state == 'PENDING':
+            return SequenceStatus(id=job_id, status="pending", total_frames=0, frames=[])
+        
+        elif task.state in ('PROGRESS', 'SUCCESS'):
+            # Counters live in task.info while running, task.result once done;
+            # the frames themselves are read from their own list
+            result_data = task.info if task.state == 'PROGRESS' else task.result
+            if not result_data or "completed_frames" not in result_data:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Task returned an invalid sequence result."
+                )
+            frames = cache_service.get_sequence_frames(job_id, since)
+            envelope = orjson.dumps({
+                "id": job_id,
+                "status": "completed" if task.state == 'SUCCESS' else "progress",
+                "total_frames": result_data["total_frames"],
+                "completed_frames": result_data["completed_frames"]
+            })
+            # Splice the stored frame bytes in as-is instead of decoding and re-encoding them
+            body = envelope[:-1] + b',"frames":[' + b",".join(frames) + b"]}"
+            return Response(content=body, media_type="application/json")
+
+        elif task.state == 'FAILURE':
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Job failed: {str(task.info)}"
+            )
+            
+        else: # Other states like 'STARTED', 'RETRY'
+            return SequenceStatus(id=job_id, status=task.state.lower(), total_frames=0, frames=[])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        console.print(f"[bold red]Error getting sequence status for {job_id}: {str(e)}[/bold red]")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred while fetching the job status."
+        )
@@ -11,4 +11,15 @@ celery_app = Celery(
 
 celery_app.conf.update(
     task_track_started=True,
-)
\ No newline at end of file
+    # Decode and geometry stages run on the "geometry" pool; the CPU-heavy
+    # contour and SVG stages run on a process pool consuming "contours".
+    # Sequence jobs and the legacy single-task job mostly sleep and decode,
+    # so they go to the geometry pool rather than tie up a CPU process.
+    task_routes={
+        "app.workers.celery_worker.prepare_face_segmentation": {"queue": "geometry"},
+        "app.workers.celery_worker.extract_face_contours": {"queue": "contours"},
+        "app.workers.celery_worker.render_face_segmentation": {"queue": "contours"},
+        "app.workers.celery_worker.process_face_sequence": {"queue": "geometry"},
+        "app.workers.celery_worker.process_face_segmentation": {"queue": "geometry"},
+    },
+)
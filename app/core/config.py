@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # API Settings
@@ -17,11 +17,31 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379/0"
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
+    JOB_CLAIM_TTL: int = 3600  # Safety net for a claimed job whose worker died; refreshed at every stage
+    RESULT_CACHE_TTL: int = 86400  # Seconds pre-serialized results are kept (matches Celery's result expiry)
+    
+    # Responses
+    COMPRESSION_MIN_BYTES: int = 1024  # Smaller bodies are sent uncompressed
     
     # Performance
     LOAD_TEST_MODE: bool = False
     SIMULATION_DELAY: int = 20
     
+    # Staged pipeline
+    PIPELINE_HANDOFF_DIR: str = "/tmp/qoves-pipeline"  # Shared by the worker pools; use a tmpfs for a shared-memory handoff
+    PIPELINE_HANDOFF_TTL: int = 3600  # Seconds before artifacts of unfinished jobs are swept
+    PIPELINE_STAGE_MAX_RETRIES: int = 3
+    
+    # Contour levels of detail: Douglas-Peucker epsilon as a fraction of the contour perimeter
+    CONTOUR_DETAIL_LEVELS: Dict[str, float] = {"coarse": 0.02, "default": 0.005, "fine": 0.001}
+    CONTOUR_DEFAULT_LEVEL: str = "default"
+    
+    # Sequence (multi-frame) jobs
+    SEQUENCE_MAX_FRAMES: int = 120
+    SEQUENCE_LANDMARK_TOLERANCE: float = 2.0  # Max landmark drift (px) before the transform is recomputed
+    SEQUENCE_REGION_CHANGE_THRESHOLD: float = 0.02  # Fraction of a region's pixels that must change to redo its contours
+    SEQUENCE_ANGLE_SMOOTHING: float = 0.5  # Weight of the newest angle estimate when the transform is recomputed
+    
     # Monitoring
     PROMETHEUS_ENABLED: bool = True
     
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 import base64
 
@@ -23,6 +23,32 @@ class JobResponse(BaseModel):
 class CropResult(BaseModel):
     svg: str  # base64 encoded SVG
     mask_contours: Dict[str, List[List[Dict[str, float]]]]
+    level: Optional[str] = None  # Level of detail of the contours
+
+class SequenceFrame(BaseModel):
+    image: str  # base64 encoded
+    landmarks: List[LandmarkPoint]
+    segmentation_map: str  # base64 encoded
+
+class SequenceSubmitRequest(BaseModel):
+    frames: List[SequenceFrame] = Field(..., min_length=1)  # ordered
+    # Optional per-job overrides of the SEQUENCE_* settings
+    landmark_tolerance: Optional[float] = Field(None, ge=0)
+    change_threshold: Optional[float] = Field(None, ge=0, le=1)
+
+class SequenceFrameResult(BaseModel):
+    index: int
+    svg: str  # base64 encoded SVG
+    mask_contours: Dict[str, List[List[Dict[str, float]]]]
+    transform_reused: bool
+    regions_recomputed: List[str]
+
+class SequenceStatus(BaseModel):
+    id: str
+    status: str
+    total_frames: int
+    completed_frames: int = 0
+    frames: List[SequenceFrameResult]
 
 class ErrorResponse(BaseModel):
     detail: str
@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import json
+import uuid
+from typing import List, Optional, Tuple
+
+import orjson
+import redis
+
+from app.core.config import settings
+from app.models.schemas import LandmarkPoint
+from app.utils.http_utils import IDENTITY, compress, content_etag
+from app.utils.image_utils import decode_base64_payload
+
+# Bump when processing changes so identical inputs map to fresh job IDs
+# instead of results computed by the previous pipeline.
+JOB_KEY_VERSION = "1"
+
+INFLIGHT_KEY_PREFIX = "qoves:inflight:"
+RENDERED_KEY_PREFIX = "qoves:rendered:"
+SEQUENCE_FRAMES_KEY_PREFIX = "qoves:seq:"
+
+
+def status_view(level: str) -> str:
+    """Cache view name of the /status payload at one level of detail"""
+    return f"status:{level}"
+
+
+def svg_view(level: str) -> str:
+    """Cache view name of the raw SVG document at one level of detail"""
+    return f"svg:{level}"
+
+
+def status_payload(svg: str, mask_contours: dict, level: str) -> dict:
+    """The /status body of a completed job; built the same way by API and worker"""
+    return {"svg": svg, "mask_contours": mask_contours, "level": level}
+
+
+def status_body(payload: dict) -> bytes:
+    """Serialized body of a /status view"""
+    return orjson.dumps(payload)
+
+
+def svg_body(svg_base64: str) -> bytes:
+    """Raw SVG document served by the SVG endpoint"""
+    return base64.b64decode(svg_base64)
+
+
+class JobKeyBuilder:
+    """Incrementally hash job inputs into a deterministic, UUID-shaped job ID"""
+
+    def __init__(self, job_type: str):
+        self._digest = hashlib.sha256()
+        self.add_text(f"{job_type}:v{JOB_KEY_VERSION}")
+
+    def add_bytes(self, data: bytes) -> "JobKeyBuilder":
+        # Length-prefix every part so adjacent parts can never run together
+        self._digest.update(len(data).to_bytes(8, "big"))
+        self._digest.update(data)
+        return self
+
+    def add_text(self, text: str) -> "JobKeyBuilder":
+        return self.add_bytes(text.encode("utf-8"))
+
+    def add_image(self, base64_str: str) -> "JobKeyBuilder":
+        """Hash the decoded bytes, so data-URL and raw base64 uploads coincide"""
+        return self.add_bytes(decode_base64_payload(base64_str))
+
+    def add_landmarks(self, landmarks: List[LandmarkPoint]) -> "JobKeyBuilder":
+        return self.add_text(json.dumps([[p.x, p.y] for p in landmarks]))
+
+    def add_json(self, value) -> "JobKeyBuilder":
+        return self.add_text(json.dumps(value, sort_keys=True))
+
+    def job_id(self) -> str:
+        return str(uuid.UUID(bytes=self._digest.digest()[:16]))
+
+
+class CacheService:
+    """Redis-backed coordination shared by every API replica and worker"""
+
+    def __init__(self, redis_url: str = settings.REDIS_URL):
+        # The connection pool is created lazily on the first command
+        self.redis = redis.Redis.from_url(redis_url)
+
+    def claim_job(self, job_id: str) -> bool:
+        """
+        Atomically claim a job ID (SET NX). Only the caller that gets True
+        may enqueue the job; everyone else should reuse the existing job.
+        """
+        return bool(self.redis.set(
+            INFLIGHT_KEY_PREFIX + job_id, "1", nx=True, ex=settings.JOB_CLAIM_TTL
+        ))
+
+    def refresh_job(self, job_id: str, ttl: Optional[int] = None) -> None:
+        """
+        Keep a claim alive while its job runs. Called at every stage, so the
+        claim's TTL only matters if a worker dies mid-job; a finished job keeps
+        its claim for `ttl` seconds so resubmissions reuse the stored result.
+        """
+        self.redis.set(INFLIGHT_KEY_PREFIX + job_id, "1", ex=ttl or settings.JOB_CLAIM_TTL)
+
+    def release_job(self, job_id: str) -> None:
+        """Drop a claim so the next identical submission is processed again"""
+        self.redis.delete(INFLIGHT_KEY_PREFIX + job_id)
+
+    def store_rendered(self, job_id: str, view: str, body: bytes) -> Tuple[str, int]:
+        """
+        Store a finished response body once, keyed by job and view.
+        
+        Returns the (ETag, size) pair. Compressed variants are added to the
+        same hash the first time a client asks for them.
+        """
+        etag = content_etag(body)
+        key = f"{RENDERED_KEY_PREFIX}{job_id}:{view}"
+        pipeline = self.redis.pipeline()
+        pipeline.hset(key, mapping={"etag": etag, "size": len(body), IDENTITY: body})
+        pipeline.expire(key, settings.RESULT_CACHE_TTL)
+        pipeline.execute()
+        return etag, len(body)
+
+    def store_status_view(self, job_id: str, level: str, payload: dict) -> Tuple[str, int]:
+        """Pre-serialize a completed /status payload"""
+        return self.store_rendered(job_id, status_view(level), status_body(payload))
+
+    def store_svg_view(self, job_id: str, level: str, svg_base64: str) -> Tuple[str, int]:
+        """Store the decoded SVG document served by the SVG endpoint"""
+        return self.store_rendered(job_id, svg_view(level), svg_body(svg_base64))
+
+    def get_rendered_meta(self, job_id: str, view: str) -> Optional[Tuple[str, int]]:
+        """Return (ETag, size) of a stored view, or None if it has not been rendered yet"""
+        etag, size = self.redis.hmget(f"{RENDERED_KEY_PREFIX}{job_id}:{view}", "etag", "size")
+        if etag is None or size is None:
+            return None
+        return etag.decode("utf-8"), int(size)
+
+    def get_rendered_body(self, job_id: str, view: str, encoding: str = IDENTITY) -> Optional[bytes]:
+        """Return a stored view in the requested content-coding, compressing it at most once"""
+        key = f"{RENDERED_KEY_PREFIX}{job_id}:{view}"
+        body = self.redis.hget(key, encoding)
+        if body is not None or encoding == IDENTITY:
+            return body
+        identity = self.redis.hget(key, IDENTITY)
+        if identity is None:
+            return None
+        body = compress(identity, encoding)
+        # The key may expire between the two commands, and the HSET would then
+        # recreate it without a TTL; NX leaves the TTL of a live key untouched
+        pipeline = self.redis.pipeline()
+        pipeline.hset(key, encoding, body)
+        pipeline.expire(key, settings.RESULT_CACHE_TTL, nx=True)
+        pipeline.execute()
+        return body
+
+    def reset_sequence_frames(self, job_id: str) -> None:
+        """Drop frames published by an earlier run of the same sequence job"""
+        self.redis.delete(SEQUENCE_FRAMES_KEY_PREFIX + job_id)
+
+    def append_sequence_frame(self, job_id: str, frame: dict) -> None:
+        """Publish one finished frame; earlier frames are never rewritten"""
+        key = SEQUENCE_FRAMES_KEY_PREFIX + job_id
+        pipeline = self.redis.pipeline()
+        pipeline.rpush(key, orjson.dumps(frame))
+        pipeline.expire(key, settings.RESULT_CACHE_TTL)
+        pipeline.execute()
+
+    def get_sequence_frames(self, job_id: str, since: int = 0) -> List[bytes]:
+        """Return the serialized frames from index `since` onwards"""
+        return self.redis.lrange(SEQUENCE_FRAMES_KEY_PREFIX + job_id, since, -1)
+
+
+cache_service = CacheService()
@@ -1,12 +1,10 @@
 import cv2
 import numpy as np
-from typing import List, Tuple, Dict, Any
-from scipy import ndimage
-from skimage import measure, morphology
+from typing import List, Sequence, Tuple, Dict, Any
 from app.models.schemas import LandmarkPoint
-import base64
+from app.utils.geometry_utils import rank_from_levels
+from app.utils.image_utils import decode_base64_payload
 from io import BytesIO
-from PIL import Image
 
 class ImageProcessor:
     def __init__(self):
@@ -18,18 +16,27 @@ class ImageProcessor:
     
     def decode_base64_image(self, base64_str: str) -> np.ndarray:
         """Decode base64 string to a BGR numpy array for OpenCV"""
+        from PIL import Image  # Deferred: only the decode path needs PIL
+
         try:
-            # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
-            if ',' in base64_str:
-                base64_str = base64_str.split(',')[1]
-            
-            image_data = base64.b64decode(base64_str)
+            image_data = decode_base64_payload(base64_str)
             image = Image.open(BytesIO(image_data))
             # Convert to numpy array and ensure it's in BGR format for OpenCV
             return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
         except Exception as e:
             raise ValueError(f"Invalid base64 image: {str(e)}")
     
+    def decode_base64_image_shape(self, base64_str: str) -> Tuple[int, int]:
+        """Read (height, width) from an encoded image header without decoding pixels"""
+        from PIL import Image  # Deferred: only the decode path needs PIL
+
+        try:
+            # PIL parses only the header until pixel data is requested
+            width, height = Image.open(BytesIO(decode_base64_payload(base64_str))).size
+            return height, width
+        except Exception as e:
+            raise ValueError(f"Invalid base64 image: {str(e)}")
+    
     def detect_face_angle(self, landmarks: List[LandmarkPoint]) -> float:
         """Calculate face rotation angle from landmarks"""
         if len(landmarks) < 48: # Need at least eye landmarks
@@ -50,6 +57,28 @@ class ImageProcessor:
         
         return angle
     
+    def get_rotation_matrix(self, image_shape: tuple, angle: float) -> np.ndarray:
+        """Build the affine matrix that rotates an image around its center"""
+        height, width = image_shape[:2]
+        center = (width // 2, height // 2)
+        return cv2.getRotationMatrix2D(center, angle, 1.0)
+    
+    def rotate_landmarks(
+        self, 
+        landmarks: List[LandmarkPoint], 
+        rotation_matrix: np.ndarray
+    ) -> List[LandmarkPoint]:
+        """Apply a rotation matrix to a list of landmarks"""
+        rotated_landmarks = []
+        for landmark in landmarks:
+            # Create a point vector [x, y, 1] for matrix multiplication
+            point = np.array([landmark.x, landmark.y, 1])
+            rotated_point = rotation_matrix @ point
+            rotated_landmarks.append(
+                LandmarkPoint(x=rotated_point[0], y=rotated_point[1])
+            )
+        return rotated_landmarks
+    
     def rotate_image_and_landmarks(
         self, 
         image: np.ndarray, 
@@ -61,35 +90,24 @@ class ImageProcessor:
             return image, landmarks
         
         height, width = image.shape[:2]
-        center = (width // 2, height // 2)
         
         # Rotation matrix
-        rotation_matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotation_matrix = self.get_rotation_matrix(image.shape, angle)
         
         # Rotate image
         rotated_image = cv2.warpAffine(image, rotation_matrix, (width, height))
         
         # Rotate landmarks
-        rotated_landmarks = []
-        for landmark in landmarks:
-            # Create a point vector [x, y, 1] for matrix multiplication
-            point = np.array([landmark.x, landmark.y, 1])
-            rotated_point = rotation_matrix @ point
-            rotated_landmarks.append(
-                LandmarkPoint(x=rotated_point[0], y=rotated_point[1])
-            )
+        rotated_landmarks = self.rotate_landmarks(landmarks, rotation_matrix)
         
         return rotated_image, rotated_landmarks
     
-    def crop_face_region(
+    def compute_crop_box(
         self, 
-        image: np.ndarray, 
+        image_shape: tuple, 
         landmarks: List[LandmarkPoint]
-    ) -> Tuple[np.ndarray, List[LandmarkPoint]]:
-        """Intelligently crop face region with proper padding"""
-        if not landmarks:
-            return image, landmarks
-        
+    ) -> Tuple[int, int, int, int]:
+        """Compute the padded face bounding box (x1, y1, x2, y2) from landmarks"""
         # Get bounding box from landmarks
         xs = [p.x for p in landmarks]
         ys = [p.y for p in landmarks]
@@ -106,8 +124,21 @@ class ImageProcessor:
         # Calculate crop boundaries, ensuring they are within image dimensions
         crop_x1 = max(0, int(min_x - padding_x))
         crop_y1 = max(0, int(min_y - padding_y))
-        crop_x2 = min(image.shape[1], int(max_x + padding_x))
-        crop_y2 = min(image.shape[0], int(max_y + padding_y))
+        crop_x2 = min(image_shape[1], int(max_x + padding_x))
+        crop_y2 = min(image_shape[0], int(max_y + padding_y))
+        
+        return crop_x1, crop_y1, crop_x2, crop_y2
+    
+    def crop_face_region(
+        self, 
+        image: np.ndarray, 
+        landmarks: List[LandmarkPoint]
+    ) -> Tuple[np.ndarray, List[LandmarkPoint]]:
+        """Intelligently crop face region with proper padding"""
+        if not landmarks:
+            return image, landmarks
+        
+        crop_x1, crop_y1, crop_x2, crop_y2 = self.compute_crop_box(image.shape, landmarks)
         
         # Crop image
         cropped_image = image[crop_y1:crop_y2, crop_x1:crop_x2]
@@ -122,6 +153,8 @@ class ImageProcessor:
     
     def smooth_segmentation_mask(self, mask: np.ndarray) -> np.ndarray:
         """Apply smoothing to a binary segmentation mask"""
+        from scipy import ndimage  # Deferred: SciPy is only needed for smoothing
+
         # Morphological closing to fill small holes
         kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
         closed_mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
@@ -134,52 +167,111 @@ class ImageProcessor:
         
         return final_mask
     
-    def extract_contours_from_segmentation(
+    def extract_region_ranked_contours(
         self, 
-        segmentation_map: np.ndarray
-    ) -> Dict[str, List[List[Dict[str, float]]]]:
-        """Extract smooth contours from the full segmentation map"""
+        segmentation_map: np.ndarray, 
+        region_id: int,
+        epsilon_fractions: Sequence[float] = (0.005,)
+    ) -> Tuple[List[List[Dict[str, float]]], List[List[float]]]:
+        """
+        Extract contours for a single region together with a detail rank per point.
+        
+        Each level in `epsilon_fractions` is simplified with `approxPolyDP` in the
+        same pass, and the levels are merged into one ranked point list. Any of them
+        can later be derived with `select_detail_level`, without reprocessing.
+        """
+        # Create a binary mask for the current region
+        region_mask = (segmentation_map == region_id).astype(np.uint8)
+        
+        # Smooth the individual region mask
+        smoothed_mask = self.smooth_segmentation_mask(region_mask)
+        
+        # Find contours on the smoothed mask
+        contours, _ = cv2.findContours(
+            smoothed_mask, 
+            cv2.RETR_EXTERNAL, # Get only external contours
+            cv2.CHAIN_APPROX_SIMPLE # Compress contour points
+        )
+        
+        region_contours = []
+        region_ranks = []
+        for contour in contours:
+            if cv2.contourArea(contour) < 20: # Filter out tiny noise contours
+                continue
+            
+            # approxPolyDP returns a subset of the input points; map them back
+            # to contour indices so the levels can be intersected
+            points = contour.reshape(-1, 2)
+            index_of = {}
+            for index, point in enumerate(map(tuple, points.tolist())):
+                index_of.setdefault(point, index)
+            
+            arc_length = cv2.arcLength(contour, True)
+            levels = []
+            for fraction in epsilon_fractions:
+                # Simplify the contour to reduce number of points
+                simplified_contour = cv2.approxPolyDP(contour, fraction * arc_length, True)
+                levels.append(
+                    (fraction, [index_of[tuple(point)] for point in simplified_contour.reshape(-1, 2).tolist()])
+                )
+            order, ranks = rank_from_levels(levels)
+            
+            # Convert to the required format (list of dicts)
+            contour_points = [
+                {"x": float(points[index][0]), "y": float(points[index][1])}
+                for index in order
+            ]
+            
+            if len(contour_points) > 2:  # Only keep meaningful lines
+                region_contours.append(contour_points)
+                region_ranks.append(ranks)
+        
+        return region_contours, region_ranks
+    
+    def extract_region_contours(
+        self, 
+        segmentation_map: np.ndarray, 
+        region_id: int,
+        epsilon_fraction: float = 0.005
+    ) -> List[List[Dict[str, float]]]:
+        """Extract smooth contours for a single region at one level of detail"""
+        region_contours, _ = self.extract_region_ranked_contours(
+            segmentation_map, region_id, (epsilon_fraction,)
+        )
+        return region_contours
+    
+    def extract_ranked_contours_from_segmentation(
+        self, 
+        segmentation_map: np.ndarray,
+        epsilon_fractions: Sequence[float] = (0.005,)
+    ) -> Tuple[Dict[str, List[List[Dict[str, float]]]], Dict[str, List[List[float]]]]:
+        """Extract ranked contours for every region of the segmentation map"""
         contours_dict = {}
+        ranks_dict = {}
         
         # Get unique region IDs (excluding background, assumed to be 0)
         unique_regions = np.unique(segmentation_map)
         unique_regions = unique_regions[unique_regions > 0]
         
         for region_id in unique_regions:
-            # Create a binary mask for the current region
-            region_mask = (segmentation_map == region_id).astype(np.uint8)
-            
-            # Smooth the individual region mask
-            smoothed_mask = self.smooth_segmentation_mask(region_mask)
-            
-            # Find contours on the smoothed mask
-            contours, _ = cv2.findContours(
-                smoothed_mask, 
-                cv2.RETR_EXTERNAL, # Get only external contours
-                cv2.CHAIN_APPROX_SIMPLE # Compress contour points
+            region_contours, region_ranks = self.extract_region_ranked_contours(
+                segmentation_map, region_id, epsilon_fractions
             )
-            
-            region_contours = []
-            for contour in contours:
-                if cv2.contourArea(contour) < 20: # Filter out tiny noise contours
-                    continue
-                
-                # Simplify the contour to reduce number of points
-                epsilon = 0.005 * cv2.arcLength(contour, True)
-                simplified_contour = cv2.approxPolyDP(contour, epsilon, True)
-                
-                # Convert to the required format (list of dicts)
-                contour_points = [
-                    {"x": float(point[0][0]), "y": float(point[0][1])}
-                    for point in simplified_contour
-                ]
-                
-                if len(contour_points) > 2:  # Only keep meaningful lines
-                    region_contours.append(contour_points)
-            
             if region_contours:
                 contours_dict[str(region_id)] = region_contours
+                ranks_dict[str(region_id)] = region_ranks
         
+        return contours_dict, ranks_dict
+    
+    def extract_contours_from_segmentation(
+        self, 
+        segmentation_map: np.ndarray,
+        epsilon_fraction: float = 0.005
+    ) -> Dict[str, List[List[Dict[str, float]]]]:
+        """Extract smooth contours from the full segmentation map"""
+        contours_dict, _ = self.extract_ranked_contours_from_segmentation(
+            segmentation_map, (epsilon_fraction,)
+        )
         return contours_dict
     
     def validate_face_detection(self, image: np.ndarray) -> bool:
@@ -0,0 +1,158 @@
+import cv2
+import numpy as np
+from typing import List, Tuple, Dict, Any, Optional
+from app.models.schemas import LandmarkPoint
+from app.services.image_processor import ImageProcessor
+
+class SequenceProcessor:
+    """
+    Process an ordered sequence of frames of the same face, reusing work
+    from earlier frames wherever the input has not meaningfully changed.
+    """
+
+    def __init__(
+        self,
+        image_processor: ImageProcessor,
+        landmark_tolerance: float,
+        change_threshold: float,
+        angle_smoothing: float
+    ):
+        self.image_processor = image_processor
+        self.landmark_tolerance = landmark_tolerance
+        self.change_threshold = change_threshold
+        self.angle_smoothing = angle_smoothing
+
+        # Transform state, recomputed only when landmarks drift
+        self._reference_points: Optional[np.ndarray] = None
+        self._reference_shape: Optional[tuple] = None
+        self._angle: Optional[float] = None
+        self._rotation_matrix: Optional[np.ndarray] = None  # None means "no rotation"
+        self._crop_box: Optional[Tuple[int, int, int, int]] = None
+
+        # Per-region contour cache: the mask the contours were computed from
+        self._region_masks: Dict[str, np.ndarray] = {}
+        self._region_contours: Dict[str, List[List[Dict[str, float]]]] = {}
+
+    def validate_first_frame(self, image: np.ndarray) -> None:
+        """Run the cascade face check once for the whole sequence"""
+        if not self.image_processor.validate_face_detection(image):
+            raise ValueError("No face detected in the first frame of the sequence.")
+
+    def process_frame(
+        self,
+        image_shape: tuple,
+        segmentation_map: np.ndarray,
+        landmarks: List[LandmarkPoint]
+    ) -> Dict[str, Any]:
+        """Crop one frame's segmentation map and return its (partly reused) contours"""
+        points = np.array([[p.x, p.y] for p in landmarks], dtype=float).reshape(-1, 2)
+
+        transform_reused = self._transform_is_reusable(image_shape, points)
+        if not transform_reused:
+            self._update_transform(image_shape, landmarks, points)
+
+        # Only the segmentation map is warped; the image is needed just for its shape.
+        # Like single-image jobs, the map is rotated around its own center.
+        if self._rotation_matrix is not None:
+            height, width = segmentation_map.shape[:2]
+            seg_rotation_matrix = self.image_processor.get_rotation_matrix(
+                segmentation_map.shape, self._angle
+            )
+            segmentation_map = cv2.warpAffine(segmentation_map, seg_rotation_matrix, (width, height))
+
+        crop_x1, crop_y1, crop_x2, crop_y2 = self._crop_box
+        cropped_seg_map = segmentation_map[crop_y1:crop_y2, crop_x1:crop_x2]
+
+        regions_recomputed = self._update_contours(cropped_seg_map, force=not transform_reused)
+
+        return {
+            "image_shape": (crop_y2 - crop_y1, crop_x2 - crop_x1),
+            "mask_contours": {
+                region_id: contours
+                for region_id, contours in self._region_contours.items()
+                if contours
+            },
+            "transform_reused": transform_reused,
+            "regions_recomputed": regions_recomputed,
+        }
+
+    def _transform_is_reusable(self, image_shape: tuple, points: np.ndarray) -> bool:
+        """The transform is reusable while every landmark stays within tolerance"""
+        if self._reference_points is None or self._reference_shape != tuple(image_shape[:2]):
+            return False
+        if points.shape != self._reference_points.shape:
+            return False
+        if len(points) == 0:
+            return True
+        drift = np.linalg.norm(points - self._reference_points, axis=1).max()
+        return bool(drift <= self.landmark_tolerance)
+
+    def _update_transform(
+        self,
+        image_shape: tuple,
+        landmarks: List[LandmarkPoint],
+        points: np.ndarray
+    ) -> None:
+        """Estimate a smoothed rotation angle and the matching crop box"""
+        measured_angle = self.image_processor.detect_face_angle(landmarks)
+        if self._angle is None:
+            self._angle = measured_angle
+        else:
+            # Exponential smoothing damps frame-to-frame jitter in the estimate
+            self._angle = (
+                self.angle_smoothing * measured_angle
+                + (1 - self.angle_smoothing) * self._angle
+            )
+
+        if abs(self._angle) < 1.0:  # Same small-angle cutoff as single-image jobs
+            self._rotation_matrix = None
+            rotated_landmarks = landmarks
+        else:
+            self._rotation_matrix = self.image_processor.get_rotation_matrix(image_shape, self._angle)
+            rotated_landmarks = self.image_processor.rotate_landmarks(landmarks, self._rotation_matrix)
+
+        if rotated_landmarks:
+            self._crop_box = self.image_processor.compute_crop_box(image_shape, rotated_landmarks)
+        else:
+            self._crop_box = (0, 0, image_shape[1], image_shape[0])
+
+        self._reference_points = points
+        self._reference_shape = tuple(image_shape[:2])
+
+    def _update_contours(self, cropped_seg_map: np.ndarray, force: bool) -> List[str]:
+        """Recompute contours only for regions whose pixels changed beyond the threshold"""
+        unique_regions = np.unique(cropped_seg_map)
+        unique_regions = unique_regions[unique_regions > 0]
+
+        region_masks = {}
+        regions_recomputed = []
+        for region_id in unique_regions:
+            key = str(region_id)
+            mask = cropped_seg_map == region_id
+            region_masks[key] = mask
+
+            if not force and not self._region_changed(key, mask):
+                continue
+
+            self._region_contours[key] = self.image_processor.extract_region_contours(
+                cropped_seg_map, region_id
+            )
+            self._region_masks[key] = mask
+            regions_recomputed.append(key)
+
+        # Forget regions that are no longer present in this frame
+        for key in list(self._region_contours):
+            if key not in region_masks:
+                del self._region_contours[key]
+                del self._region_masks[key]
+
+        return regions_recomputed
+
+    def _region_changed(self, key: str, mask: np.ndarray) -> bool:
+        """Compare against the mask the cached contours were computed from, not the last frame"""
+        reference = self._region_masks.get(key)
+        if reference is None or reference.shape != mask.shape:
+            return True
+        changed_pixels = np.count_nonzero(reference ^ mask)
+        region_pixels = max(np.count_nonzero(reference), np.count_nonzero(mask), 1)
+        return bool(changed_pixels / region_pixels > self.change_threshold)
@@ -1,7 +1,6 @@
 import base64
 from typing import Dict, List
 from xml.etree.ElementTree import Element, SubElement, tostring
-import numpy as np
 
 class SVGGenerator:
     def __init__(self):
@@ -0,0 +1,55 @@
+from typing import Dict, Iterable, List, Tuple
+
+# Rank of the points kept even by the coarsest level. Every other rank is
+# one of the configured epsilon fractions, all well below 1.0.
+ANCHOR_RANK = 1.0
+
+
+def rank_from_levels(levels: List[Tuple[float, Iterable[int]]]) -> Tuple[List[int], List[float]]:
+    """
+    Merge per-level simplifications of one contour into a single ranked list.
+
+    `levels` holds (epsilon fraction, indices of the raw contour points kept
+    at that level). Each coarser level is restricted to the points of the
+    next finer one, so levels are always nested. A point's rank is the epsilon
+    of the first level that drops it, so that `rank > epsilon` reproduces
+    every level. Returns the finest level's indices in contour order and
+    their ranks.
+    """
+    levels = sorted(levels, key=lambda level: level[0])
+    ranks = {}
+    kept = None
+    for position, (_, indices) in enumerate(levels):
+        kept = set(indices) if kept is None else kept.intersection(indices)
+        next_epsilon = levels[position + 1][0] if position + 1 < len(levels) else ANCHOR_RANK
+        for index in kept:
+            ranks[index] = next_epsilon
+    order = sorted(ranks)
+    return order, [ranks[index] for index in order]
+
+
+def simplify_ranked_contour(
+    contour: List[Dict[str, float]],
+    ranks: List[float],
+    epsilon_fraction: float
+) -> List[Dict[str, float]]:
+    """Keep the vertices whose rank exceeds epsilon (a fraction of the perimeter)"""
+    return [point for point, rank in zip(contour, ranks) if rank > epsilon_fraction]
+
+
+def select_detail_level(
+    contours: Dict[str, List[List[Dict[str, float]]]],
+    ranks: Dict[str, List[List[float]]],
+    epsilon_fraction: float
+) -> Dict[str, List[List[Dict[str, float]]]]:
+    """Derive the mask contours for one detail level from ranked contours"""
+    level_contours = {}
+    for region_id, region_contours in contours.items():
+        simplified = [
+            simplify_ranked_contour(contour, contour_ranks, epsilon_fraction)
+            for contour, contour_ranks in zip(region_contours, ranks[region_id])
+        ]
+        simplified = [contour for contour in simplified if len(contour) > 2]
+        if simplified:
+            level_contours[region_id] = simplified
+    return level_contours
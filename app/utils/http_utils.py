@@ -0,0 +1,78 @@
+import gzip
+import hashlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # Optional: fall back to gzip when Brotli is not installed
+    brotli = None
+
+IDENTITY = "identity"
+
+
+def content_etag(body: bytes) -> str:
+    """Strong ETag derived from the response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Give each content-coding its own ETag, as they are different representations"""
+    if encoding == IDENTITY:
+        return etag
+    return etag[:-1] + "-" + encoding + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag, ignoring weakness and coding suffixes"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    base = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == base or candidate.startswith(base + "-"):
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """Pick the best supported content-coding from an Accept-Encoding header"""
+    if not accept_encoding:
+        return IDENTITY
+
+    weights = {}
+    for entry in accept_encoding.split(","):
+        parts = [part.strip() for part in entry.split(";")]
+        coding = parts[0].lower()
+        weight = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    weight = float(param[2:])
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding] = weight
+
+    # Brotli compresses SVG/JSON noticeably better, so it wins ties
+    preferred = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(
+        preferred,
+        key=lambda coding: (weights.get(coding, weights.get("*", 0.0)), -preferred.index(coding))
+    )
+    if weights.get(best, weights.get("*", 0.0)) > 0:
+        return best
+    return IDENTITY
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Encode a body with the given content-coding"""
+    if encoding == "br":
+        return brotli.compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
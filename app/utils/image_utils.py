@@ -0,0 +1,9 @@
+import base64
+
+
+def decode_base64_payload(base64_str: str) -> bytes:
+    """Decode a base64 string (optionally a data URL) to raw bytes"""
+    # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
+    if ',' in base64_str:
+        base64_str = base64_str.split(',')[1]
+    return base64.b64decode(base64_str)
@@ -1,3 +1,4 @@
+import threading
 import time
 import cv2
 from rich.console import Console
@@ -5,76 +6,318 @@ from rich.console import Console
 # 从中心位置导入celery_app实例
 from app.core.celery_app import celery_app
 from app.core.config import settings
+from app.services.cache_service import cache_service, status_payload
 from app.services.image_processor import ImageProcessor
+from app.services.sequence_processor import SequenceProcessor
 from app.services.svg_generator import SVGGenerator
-from app.models.schemas import CropSubmitRequest
+from app.models.schemas import CropSubmitRequest, SequenceSubmitRequest
+from app.utils.geometry_utils import select_detail_level
+from app.workers import handoff
+from app.workers.signatures import (
+    PROCESS_FACE_SEGMENTATION, PROCESS_FACE_SEQUENCE,
+    PREPARE_FACE_SEGMENTATION, EXTRACT_FACE_CONTOURS, RENDER_FACE_SEGMENTATION
+)
 
 console = Console()
 
-# 使用导入的celery_app实例来定义任务
-@celery_app.task(bind=True)
+svg_generator = SVGGenerator()
+
+# The geometry pool runs tasks on threads, and the face cascade held by an
+# ImageProcessor is not thread-safe (detectMultiScale writes the classifier's
+# state), so each worker thread builds its own instance.
+_thread_state = threading.local()
+
+
+def get_image_processor() -> ImageProcessor:
+    """Return the calling thread's ImageProcessor, creating it on first use"""
+    processor = getattr(_thread_state, "image_processor", None)
+    if processor is None:
+        processor = _thread_state.image_processor = ImageProcessor()
+    return processor
+
+
+class PipelineStage(celery_app.Task):
+    """
+    Base class of the face segmentation stages.
+    
+    Transient I/O errors (e.g. on the handoff volume) are retried for the failed
+    stage only; earlier stages are never rerun because their output is on disk.
+    """
+    autoretry_for = (OSError,)
+    retry_backoff = True
+    max_retries = settings.PIPELINE_STAGE_MAX_RETRIES
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        job_id = args[0].get('job_id') if args else None
+        if job_id is None:
+            return
+        # Free the job ID so a resubmission is processed instead of coalesced onto this failure
+        cache_service.release_job(job_id)
+        if task_id != job_id:
+            # The chain stops here, so record the failure under the job's ID for /status
+            self.backend.mark_as_failure(job_id, exc, traceback=einfo.traceback)
+
+
+def mark_stage(job_id: str, stage: str) -> None:
+    """Report the running stage under the job's ID, which belongs to the last stage"""
+    celery_app.backend.store_result(job_id, {"stage": stage}, "STARTED")
+    # A claim that expired mid-job would let a duplicate chain discard our artifacts
+    cache_service.refresh_job(job_id)
+
+
+def prepare_stage(job_data: dict) -> dict:
+    """Decode, validate, rotate and crop, then hand the cropped segmentation map on"""
+    job_id = job_data.get('job_id')
+    
+    if handoff.has_json(job_id, "geometry"):
+        console.print(f"   - Reusing decoded geometry for job {job_id}")
+        return {"job_id": job_id, **handoff.load_json(job_id, "geometry")}
+    
+    if not settings.LOAD_TEST_MODE:
+        console.print(f"   - Simulating {settings.SIMULATION_DELAY}s delay for job {job_id}")
+        time.sleep(settings.SIMULATION_DELAY)
+    
+    request_data = CropSubmitRequest(**job_data['request'])
+    image_processor = get_image_processor()
+    
+    console.print(f"   - Decoding images for job {job_id}")
+    image = image_processor.decode_base64_image(request_data.image)
+    segmentation_map = image_processor.decode_base64_image(request_data.segmentation_map)
+    
+    if len(segmentation_map.shape) == 3:
+        segmentation_map_gray = cv2.cvtColor(segmentation_map, cv2.COLOR_BGR2GRAY)
+    else:
+        segmentation_map_gray = segmentation_map
+
+    if not image_processor.validate_face_detection(image):
+        raise ValueError("No face detected in the provided image.")
+    
+    console.print(f"   - Rotating image for job {job_id}")
+    rotation_angle = image_processor.detect_face_angle(request_data.landmarks)
+    rotated_image, rotated_landmarks = image_processor.rotate_image_and_landmarks(
+        image, request_data.landmarks, rotation_angle
+    )
+    
+    console.print(f"   - Cropping face region for job {job_id}")
+    cropped_image, _ = image_processor.crop_face_region(
+        rotated_image, rotated_landmarks
+    )
+    
+    rotated_seg_map, _ = image_processor.rotate_image_and_landmarks(
+        segmentation_map_gray, request_data.landmarks, rotation_angle
+    )
+    cropped_seg_map, _ = image_processor.crop_face_region(
+        rotated_seg_map, rotated_landmarks
+    )
+    
+    # The JSON marker is written last, so its presence means the stage completed
+    geometry = {"image_shape": list(cropped_image.shape[:2])}
+    handoff.save_array(job_id, "cropped_seg_map", cropped_seg_map)
+    handoff.save_json(job_id, "geometry", geometry)
+    
+    return {"job_id": job_id, **geometry}
+
+
+def contours_stage(stage_data: dict) -> dict:
+    """Extract and rank the contours of every region (the CPU-heavy part of the pipeline)"""
+    job_id = stage_data['job_id']
+    
+    if handoff.has_json(job_id, "contours"):
+        console.print(f"   - Reusing extracted contours for job {job_id}")
+        return stage_data
+    
+    console.print(f"   - Extracting contours for job {job_id}")
+    cropped_seg_map = handoff.load_array(job_id, "cropped_seg_map")
+    # Every detail level is simplified in this one pass and stored as per-point ranks
+    ranked_contours, contour_ranks = get_image_processor().extract_ranked_contours_from_segmentation(
+        cropped_seg_map, list(settings.CONTOUR_DETAIL_LEVELS.values())
+    )
+    handoff.save_json(job_id, "contours", {"contours": ranked_contours, "ranks": contour_ranks})
+    
+    return stage_data
+
+
+def render_stage(stage_data: dict) -> dict:
+    """Build the SVG and the final result, and pre-serialize the default views"""
+    job_id = stage_data['job_id']
+    stored = handoff.load_json(job_id, "contours")
+    
+    default_level = settings.CONTOUR_DEFAULT_LEVEL
+    mask_contours = select_detail_level(
+        stored["contours"], stored["ranks"], settings.CONTOUR_DETAIL_LEVELS[default_level]
+    )
+    
+    console.print(f"   - Generating SVG for job {job_id}")
+    svg_base64 = svg_generator.generate_svg(tuple(stage_data["image_shape"]), mask_contours)
+    
+    result = {
+        "svg": svg_base64,
+        "mask_contours": mask_contours,
+        "image_shape": stage_data["image_shape"],
+        # Stored once with the job so any level can be served without reprocessing
+        "contour_levels": stored
+    }
+    
+    # Pre-serialize the default views so the first poll already takes the fast path
+    try:
+        cache_service.store_status_view(
+            job_id, default_level, status_payload(svg_base64, mask_contours, default_level)
+        )
+        cache_service.store_svg_view(job_id, default_level, svg_base64)
+    except Exception as e:
+        # Not fatal: the API renders and caches the result from the Celery backend instead
+        console.print(f"   - Could not pre-serialize result for job {job_id}: {str(e)}")
+    
+    # The result now lives in the backend, so the intermediate artifacts can go
+    handoff.discard_job(job_id)
+    handoff.discard_expired(settings.PIPELINE_HANDOFF_TTL)
+    
+    return result
+
+
+@celery_app.task(bind=True, base=PipelineStage, name=PREPARE_FACE_SEGMENTATION)
+def prepare_face_segmentation(self, job_data: dict):
+    """Stage 1 (geometry pool): decode, validate, rotate and crop"""
+    job_id = job_data.get('job_id')
+    console.print(f"[bold yellow]▶️ Starting job {job_id}...[/bold yellow]")
+    mark_stage(job_id, "prepare")
+    try:
+        return prepare_stage(job_data)
+    except Exception as e:
+        console.print(f"[bold red]❌ Error preparing job {job_id}: {str(e)}[/bold red]")
+        raise
+
+
+@celery_app.task(bind=True, base=PipelineStage, name=EXTRACT_FACE_CONTOURS)
+def extract_face_contours(self, stage_data: dict):
+    """Stage 2 (contour pool): extract and rank contours"""
+    job_id = stage_data.get('job_id')
+    mark_stage(job_id, "contours")
+    try:
+        return contours_stage(stage_data)
+    except Exception as e:
+        console.print(f"[bold red]❌ Error extracting contours for job {job_id}: {str(e)}[/bold red]")
+        raise
+
+
+@celery_app.task(bind=True, base=PipelineStage, name=RENDER_FACE_SEGMENTATION)
+def render_face_segmentation(self, stage_data: dict):
+    """Stage 3 (contour pool): render the SVG; runs under the job's own ID"""
+    job_id = stage_data.get('job_id')
+    cache_service.refresh_job(job_id)
+    try:
+        result = render_stage(stage_data)
+        # Resubmissions reuse the result for as long as the backend keeps it
+        cache_service.refresh_job(job_id, settings.RESULT_CACHE_TTL)
+        console.print(f"[bold green]✅ Completed job {job_id}[/bold green]")
+        return result
+    except Exception as e:
+        console.print(f"[bold red]❌ Error rendering job {job_id}: {str(e)}[/bold red]")
+        raise
+
+
+@celery_app.task(bind=True, base=PipelineStage, name=PROCESS_FACE_SEGMENTATION)
 def process_face_segmentation(self, job_data: dict):
-    # ... 函数的其余部分保持不变 ...
-    # (这里省略了您之前已经修复好的完整函数代码, 您无需修改函数内部)
+    """
+    Run every stage in one task. Kept for jobs that were queued before the
+    pipeline was split; new jobs are dispatched as a chain of stages.
+    """
     job_id = job_data.get('job_id')
     
     try:
         console.print(f"[bold yellow]▶️ Starting job {job_id}...[/bold yellow]")
+        cache_service.refresh_job(job_id)
+        result = render_stage(contours_stage(prepare_stage(job_data)))
+        cache_service.refresh_job(job_id, settings.RESULT_CACHE_TTL)
+        console.print(f"[bold green]✅ Completed job {job_id}[/bold green]")
+        return result
+        
+    except Exception as e:
+        console.print(f"[bold red]❌ Error in job {job_id}: {str(e)}[/bold red]")
+        raise
+
+
+@celery_app.task(bind=True, name=PROCESS_FACE_SEQUENCE)
+def process_face_sequence(self, job_data: dict):
+    """
+    Process an ordered frame sequence, publishing each frame's result to its
+    own Redis list entry as soon as it is ready. The PROGRESS state only
+    carries the frame counters.
+    """
+    job_id = job_data.get('job_id')
+    
+    try:
+        request_data = SequenceSubmitRequest(**job_data['request'])
+        total_frames = len(request_data.frames)
+        console.print(f"[bold yellow]▶️ Starting sequence job {job_id} ({total_frames} frames)...[/bold yellow]")
         
+        cache_service.refresh_job(job_id)
         if not settings.LOAD_TEST_MODE:
             console.print(f"   - Simulating {settings.SIMULATION_DELAY}s delay for job {job_id}")
             time.sleep(settings.SIMULATION_DELAY)
         
-        image_processor = ImageProcessor()
-        svg_generator = SVGGenerator()
-        
-        request_data = CropSubmitRequest(**job_data['request'])
-        
-        console.print(f"   - Decoding images for job {job_id}")
-        image = image_processor.decode_base64_image(request_data.image)
-        segmentation_map = image_processor.decode_base64_image(request_data.segmentation_map)
-        
-        if len(segmentation_map.shape) == 3:
-            segmentation_map_gray = cv2.cvtColor(segmentation_map, cv2.COLOR_BGR2GRAY)
-        else:
-            segmentation_map_gray = segmentation_map
-
-        if not image_processor.validate_face_detection(image):
-            raise ValueError("No face detected in the provided image.")
-        
-        console.print(f"   - Rotating image for job {job_id}")
-        rotation_angle = image_processor.detect_face_angle(request_data.landmarks)
-        rotated_image, rotated_landmarks = image_processor.rotate_image_and_landmarks(
-            image, request_data.landmarks, rotation_angle
+        image_processor = get_image_processor()
+        sequence_processor = SequenceProcessor(
+            image_processor,
+            landmark_tolerance=(
+                request_data.landmark_tolerance
+                if request_data.landmark_tolerance is not None
+                else settings.SEQUENCE_LANDMARK_TOLERANCE
+            ),
+            change_threshold=(
+                request_data.change_threshold
+                if request_data.change_threshold is not None
+                else settings.SEQUENCE_REGION_CHANGE_THRESHOLD
+            ),
+            angle_smoothing=settings.SEQUENCE_ANGLE_SMOOTHING,
         )
         
-        console.print(f"   - Cropping face region for job {job_id}")
-        cropped_image, _ = image_processor.crop_face_region(
-            rotated_image, rotated_landmarks
-        )
-        
-        rotated_seg_map, _ = image_processor.rotate_image_and_landmarks(
-            segmentation_map_gray, request_data.landmarks, rotation_angle
-        )
-        cropped_seg_map, _ = image_processor.crop_face_region(
-            rotated_seg_map, rotated_landmarks
-        )
-
-        console.print(f"   - Extracting contours for job {job_id}")
-        mask_contours = image_processor.extract_contours_from_segmentation(cropped_seg_map)
+        # Each frame is published to its own list entry as soon as it is done,
+        # so the task state only carries counters
+        cache_service.reset_sequence_frames(job_id)
+        for index, frame in enumerate(request_data.frames):
+            if index == 0:
+                # The face is validated once; later frames only need their size
+                image = image_processor.decode_base64_image(frame.image)
+                sequence_processor.validate_first_frame(image)
+                image_shape = image.shape
+            else:
+                image_shape = image_processor.decode_base64_image_shape(frame.image)
+            
+            segmentation_map = image_processor.decode_base64_image(frame.segmentation_map)
+            if len(segmentation_map.shape) == 3:
+                segmentation_map = cv2.cvtColor(segmentation_map, cv2.COLOR_BGR2GRAY)
+            
+            frame_result = sequence_processor.process_frame(
+                image_shape, segmentation_map, frame.landmarks
+            )
+            cache_service.append_sequence_frame(job_id, {
+                "index": index,
+                "svg": svg_generator.generate_svg(
+                    frame_result["image_shape"], frame_result["mask_contours"]
+                ),
+                "mask_contours": frame_result["mask_contours"],
+                "transform_reused": frame_result["transform_reused"],
+                "regions_recomputed": frame_result["regions_recomputed"],
+            })
+            console.print(
+                f"   - Frame {index + 1}/{total_frames} for job {job_id} "
+                f"(transform reused: {frame_result['transform_reused']}, "
+                f"regions recomputed: {len(frame_result['regions_recomputed'])})"
+            )
+            
+            self.update_state(
+                state="PROGRESS",
+                meta={"total_frames": total_frames, "completed_frames": index + 1}
+            )
+            cache_service.refresh_job(job_id)
         
-        console.print(f"   - Generating SVG for job {job_id}")
-        svg_base64 = svg_generator.generate_svg(cropped_image.shape, mask_contours)
+        cache_service.refresh_job(job_id, settings.RESULT_CACHE_TTL)
+        console.print(f"[bold green]✅ Completed sequence job {job_id}[/bold green]")
         
-        result = {
-            "svg": svg_base64,
-            "mask_contours": mask_contours
-        }
-        
-        console.print(f"[bold green]✅ Completed job {job_id}[/bold green]")
-        
-        return result
+        return {"total_frames": total_frames, "completed_frames": total_frames}
         
     except Exception as e:
-        console.print(f"[bold red]❌ Error in job {job_id}: {str(e)}[/bold red]")
-        raise
\ No newline at end of file
+        console.print(f"[bold red]❌ Error in sequence job {job_id}: {str(e)}[/bold red]")
+        cache_service.release_job(job_id)
+        raise
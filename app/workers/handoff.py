@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+import orjson
+
+from app.core.config import settings
+
+# Intermediate results are handed between pipeline stages through files in
+# PIPELINE_HANDOFF_DIR instead of through the broker. Point it at a tmpfs
+# (e.g. /dev/shm) shared by the worker pools to get a shared-memory handoff.
+# Job IDs are content-derived, so an artifact that already exists is reused.
+
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(settings.PIPELINE_HANDOFF_DIR, job_id)
+
+
+def _path(job_id: str, name: str, extension: str) -> str:
+    return os.path.join(_job_dir(job_id), f"{name}.{extension}")
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    """Write to a temporary file and rename it, so readers never see partial artifacts"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def has_array(job_id: str, name: str) -> bool:
+    return os.path.exists(_path(job_id, name, "npy"))
+
+
+def save_array(job_id: str, name: str, array: np.ndarray) -> str:
+    path = _path(job_id, name, "npy")
+    buffer = BytesIO()
+    np.save(buffer, np.ascontiguousarray(array), allow_pickle=False)
+    _atomic_write(path, buffer.getvalue())
+    return path
+
+
+def load_array(job_id: str, name: str) -> np.ndarray:
+    """Memory-map the array so the consuming stage does not copy it up front"""
+    return np.load(_path(job_id, name, "npy"), mmap_mode="r", allow_pickle=False)
+
+
+def has_json(job_id: str, name: str) -> bool:
+    return os.path.exists(_path(job_id, name, "json"))
+
+
+def save_json(job_id: str, name: str, value) -> str:
+    path = _path(job_id, name, "json")
+    _atomic_write(path, orjson.dumps(value))
+    return path
+
+
+def load_json(job_id: str, name: str):
+    with open(_path(job_id, name, "json"), "rb") as f:
+        return orjson.loads(f.read())
+
+
+def discard_job(job_id: str) -> None:
+    """Remove every artifact of a finished job"""
+    shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+
+
+def discard_expired(max_age: int) -> None:
+    """Remove artifacts left behind by jobs that never finished"""
+    root = settings.PIPELINE_HANDOFF_DIR
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - max_age
+    for entry in os.scandir(root):
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            continue  # Removed concurrently by another worker
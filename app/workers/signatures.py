@@ -0,0 +1,43 @@
+from celery import Signature, chain
+
+from app.core.celery_app import celery_app
+
+# Task names are the single contract between the API and the worker.
+# The API dispatches by name so it never has to import the worker module
+# (and with it OpenCV, SciPy and PIL) just to enqueue a job.
+PROCESS_FACE_SEGMENTATION = "app.workers.celery_worker.process_face_segmentation"
+PROCESS_FACE_SEQUENCE = "app.workers.celery_worker.process_face_sequence"
+
+# Stages of the face segmentation pipeline (queues are set in celery_app.task_routes)
+PREPARE_FACE_SEGMENTATION = "app.workers.celery_worker.prepare_face_segmentation"
+EXTRACT_FACE_CONTOURS = "app.workers.celery_worker.extract_face_contours"
+RENDER_FACE_SEGMENTATION = "app.workers.celery_worker.render_face_segmentation"
+
+
+def face_segmentation_signature(job_data: dict) -> Signature:
+    """Build the staged face segmentation pipeline without importing the tasks"""
+    return chain(
+        celery_app.signature(PREPARE_FACE_SEGMENTATION, args=[job_data]),
+        celery_app.signature(EXTRACT_FACE_CONTOURS),
+        celery_app.signature(RENDER_FACE_SEGMENTATION),
+    )
+
+
+def submit_face_segmentation(job_data: dict, task_id: str):
+    """
+    Enqueue a face segmentation job under the given task id.
+    
+    The id is given to the last stage, so the job's status and result are
+    tracked under it exactly as for a single task.
+    """
+    return face_segmentation_signature(job_data).apply_async(task_id=task_id)
+
+
+def face_sequence_signature(job_data: dict) -> Signature:
+    """Build a signature for the frame-sequence task without importing it"""
+    return celery_app.signature(PROCESS_FACE_SEQUENCE, args=[job_data])
+
+
+def submit_face_sequence(job_data: dict, task_id: str):
+    """Enqueue a frame-sequence job under the given task id"""
+    return face_sequence_signature(job_data).apply_async(task_id=task_id)
@@ -0,0 +1,84 @@
+import argparse
+import json
+import subprocess
+import sys
+
+# Modules that belong to the worker only. If any of them shows up in the API
+# process, every API replica pays their import time and memory on cold start.
+HEAVY_MODULES = ["cv2", "scipy", "skimage", "PIL", "numpy"]
+
+# Executed in a fresh interpreter so the numbers reflect a real cold start.
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":  # ru_maxrss is reported in bytes on macOS
+    rss_kb //= 1024
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "peak_rss_mb": rss_kb / 1024,
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(target: str) -> dict:
+    """Import the target module in a fresh interpreter and collect timings"""
+    probe = PROBE.format(target=target, heavy=HEAVY_MODULES)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True, text=True, check=True
+    )
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report["slowest_imports"] = parse_importtime(completed.stderr)
+    return report
+
+
+def parse_importtime(stderr: str, limit: int = 10) -> list:
+    """Extract the slowest top-level packages from `-X importtime` output"""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not cumulative.isdigit() or name.startswith(" ") or "." in name:
+            continue  # Only keep top-level packages; their time includes submodules
+        totals[name] = max(totals.get(name, 0), int(cumulative))
+    slowest = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{"module": name, "cumulative_ms": micros / 1000} for name, micros in slowest]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report API cold-start import time and memory.")
+    parser.add_argument("--target", default="app.main", help="Module to import (default: app.main)")
+    parser.add_argument("--max-seconds", type=float, help="Fail if the import takes longer than this")
+    parser.add_argument("--max-rss-mb", type=float, help="Fail if peak RSS exceeds this many MB")
+    parser.add_argument("--json", action="store_true", help="Print the raw report as JSON")
+    args = parser.parse_args()
+
+    report = measure(args.target)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Cold import of {args.target}")
+        print(f"  - import time: {report['import_seconds']:.3f}s")
+        print(f"  - peak RSS:    {report['peak_rss_mb']:.1f} MB")
+        print(f"  - heavy modules loaded: {', '.join(report['heavy_modules']) or 'none'}")
+        print("  - slowest top-level imports:")
+        for entry in report["slowest_imports"]:
+            print(f"      {entry['module']:<36} {entry['cumulative_ms']:>8.1f} ms")
+
+    failures = []
+    if report["heavy_modules"]:
+        failures.append(f"worker-only modules imported: {', '.join(report['heavy_modules'])}")
+    if args.max_seconds is not None and report["import_seconds"] > args.max_seconds:
+        failures.append(f"import took {report['import_seconds']:.3f}s (budget {args.max_seconds}s)")
+    if args.max_rss_mb is not None and report["peak_rss_mb"] > args.max_rss_mb:
+        failures.append(f"peak RSS {report['peak_rss_mb']:.1f} MB (budget {args.max_rss_mb} MB)")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
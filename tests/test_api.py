@@ -1,8 +1,63 @@
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 
 client = TestClient(app)
 
+
+class FakeRedis:
+    """In-memory stand-in for the handful of Redis commands the cache service uses."""
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.ttls[key] = ex
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        entry = self.data.setdefault(key, {})
+        for name, item in (mapping or {field: value}).items():
+            entry[name] = item if isinstance(item, bytes) else str(item).encode("utf-8")
+
+    def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    def hmget(self, key, *fields):
+        return [self.hget(key, field) for field in fields]
+
+    def expire(self, key, seconds, nx=False):
+        if not (nx and self.ttls.get(key)):
+            self.ttls[key] = seconds
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value)
+
+    def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        pass
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    from app.services.cache_service import cache_service
+
+    redis = FakeRedis()
+    monkeypatch.setattr(cache_service, "redis", redis)
+    return redis
+
 def get_mock_payload():
     """Creates a mock, valid payload for testing."""
     tiny_image_b64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
@@ -38,3 +93,220 @@ def test_submit_job_with_invalid_payload():
     }
     response = client.post("/api/v1/submit", json=invalid_payload)
     assert response.status_code == 422
+
+def test_submit_sequence_with_too_many_frames():
+    """
+    Tests that the API rejects a sequence longer than SEQUENCE_MAX_FRAMES with a 422 error.
+    """
+    from app.core.config import settings
+
+    frame = get_mock_payload()
+    payload = {"frames": [frame] * (settings.SEQUENCE_MAX_FRAMES + 1)}
+    response = client.post("/api/v1/sequence/submit", json=payload)
+    assert response.status_code == 422
+
+def test_submit_sequence_without_frames():
+    """
+    Tests that the API rejects an empty sequence with a 422 error.
+    """
+    response = client.post("/api/v1/sequence/submit", json={"frames": []})
+    assert response.status_code == 422
+
+def make_completed_task(result):
+    """Creates a stand-in for a finished Celery AsyncResult."""
+    class CompletedTask:
+        state = "SUCCESS"
+    CompletedTask.result = result
+    return CompletedTask()
+
+def get_completed_result():
+    """Builds a worker-style result for a single square contour."""
+    import base64
+
+    contour = [{"x": float(x), "y": float(y)} for x, y in [(0, 0), (5, 0), (10, 0), (10, 10), (0, 10)]]
+    ranks = [1.0, 0.005, 1.0, 1.0, 1.0]  # The collinear midpoint only survives the finer levels
+    return {
+        "svg": base64.b64encode(b"<svg />").decode("utf-8"),
+        "mask_contours": {"1": [contour]},
+        "image_shape": [20, 20],
+        "contour_levels": {"contours": {"1": [contour]}, "ranks": {"1": [ranks]}}
+    }
+
+def test_status_serves_requested_detail_level(monkeypatch, fake_redis):
+    """
+    Tests that a completed job can be fetched at another level of detail without reprocessing.
+    """
+    from app.api.v1.endpoints import crop
+
+    monkeypatch.setattr(crop.celery_app, "AsyncResult", lambda job_id: make_completed_task(get_completed_result()))
+    response = client.get("/api/v1/status/some-job", params={"level": "coarse"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["level"] == "coarse"
+    assert len(data["mask_contours"]["1"][0]) == 4  # The collinear midpoint is dropped
+
+    response = client.get("/api/v1/status/some-job", params={"level": "unknown"})
+    assert response.status_code == 422
+
+def test_svg_endpoint_returns_svg_image(monkeypatch, fake_redis):
+    """
+    Tests that the SVG endpoint returns the decoded SVG document.
+    """
+    from app.api.v1.endpoints import crop
+
+    monkeypatch.setattr(crop.celery_app, "AsyncResult", lambda job_id: make_completed_task(get_completed_result()))
+    response = client.get("/api/v1/svg/some-job", params={"level": "fine"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("image/svg+xml")
+    assert response.text.startswith("<svg")
+
+def test_duplicate_submissions_are_coalesced(monkeypatch):
+    """
+    Tests that resubmitting identical inputs returns the existing job without enqueueing it again.
+    """
+    from app.api.v1.endpoints import crop
+
+    claimed = set()
+    submitted = []
+    monkeypatch.setattr(crop.cache_service, "claim_job", lambda job_id: not (job_id in claimed or claimed.add(job_id)))
+    monkeypatch.setattr(crop, "submit_face_segmentation", lambda job_data, task_id: submitted.append(task_id))
+
+    class RunningTask:
+        state = "STARTED"
+        def forget(self):
+            pass
+    monkeypatch.setattr(crop.celery_app, "AsyncResult", lambda job_id: RunningTask())
+
+    first = client.post("/api/v1/submit", json=get_mock_payload())
+    second = client.post("/api/v1/submit", json=get_mock_payload())
+
+    assert first.status_code == second.status_code == 202
+    assert first.json()["id"] == second.json()["id"]
+    assert second.json()["status"] == "started"
+    assert submitted == [first.json()["id"]]
+
+def test_resubmitting_a_failed_job_reports_pending(monkeypatch, fake_redis):
+    """
+    Tests that resubmitting inputs whose job failed clears the old failure, so /status reports pending.
+    """
+    from app.api.v1.endpoints import crop
+
+    class FailedTask:
+        state = "FAILURE"
+        info = "boom"
+        def forget(self):
+            FailedTask.state = "PENDING"
+    monkeypatch.setattr(crop.celery_app, "AsyncResult", lambda job_id: FailedTask())
+    monkeypatch.setattr(crop, "submit_face_segmentation", lambda job_data, task_id: None)
+
+    submitted = client.post("/api/v1/submit", json=get_mock_payload())
+    assert submitted.status_code == 202
+    assert submitted.json()["status"] == "pending"
+
+    response = client.get(f"/api/v1/status/{submitted.json()['id']}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "pending"
+
+def test_claim_lasts_as_long_as_the_job(fake_redis):
+    """
+    Tests that a refreshed claim still blocks duplicates, and that a finished job keeps it for the result's lifetime.
+    """
+    from app.core.config import settings
+    from app.services.cache_service import INFLIGHT_KEY_PREFIX, cache_service
+
+    assert cache_service.claim_job("job-1")
+    cache_service.refresh_job("job-1")
+    assert not cache_service.claim_job("job-1")
+
+    cache_service.refresh_job("job-1", settings.RESULT_CACHE_TTL)
+    assert fake_redis.ttls[INFLIGHT_KEY_PREFIX + "job-1"] == settings.RESULT_CACHE_TTL
+    assert not cache_service.claim_job("job-1")
+
+def test_compressed_variant_never_outlives_the_view(fake_redis):
+    """
+    Tests that caching a compressed variant gives a recreated key a TTL instead of leaving it orphaned.
+    """
+    from app.core.config import settings
+    from app.services.cache_service import RENDERED_KEY_PREFIX, cache_service
+
+    cache_service.store_rendered("job-1", "svg:default", b"<svg />")
+    key = RENDERED_KEY_PREFIX + "job-1:svg:default"
+    fake_redis.ttls.pop(key)  # As if the key expired and was recreated without a TTL
+
+    assert cache_service.get_rendered_body("job-1", "svg:default", "gzip") is not None
+    assert fake_redis.ttls[key] == settings.RESULT_CACHE_TTL
+
+def test_completed_status_supports_etag_revalidation(monkeypatch, fake_redis):
+    """
+    Tests that completed results carry an ETag and repeat polls with If-None-Match get a 304.
+    """
+    from app.api.v1.endpoints import crop
+
+    reads = []
+    def async_result(job_id):
+        reads.append(job_id)
+        return make_completed_task(get_completed_result())
+    monkeypatch.setattr(crop.celery_app, "AsyncResult", async_result)
+
+    first = client.get("/api/v1/status/some-job")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get("/api/v1/status/some-job", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert reads == ["some-job"]  # The second poll never touched the Celery backend
+
+def test_freshly_rendered_view_is_served_without_reading_it_back(monkeypatch, fake_redis):
+    """
+    Tests that the first poll is served from the bytes it stored, even if the cache entry is gone already.
+    """
+    from app.api.v1.endpoints import crop
+
+    monkeypatch.setattr(crop.celery_app, "AsyncResult", lambda job_id: make_completed_task(get_completed_result()))
+    monkeypatch.setattr(crop.cache_service, "get_rendered_body", lambda *args: None)
+
+    response = client.get("/api/v1/status/some-job")
+    assert response.status_code == 200
+    assert response.json()["level"] == "default"
+    assert response.headers["etag"]
+
+def test_large_results_are_compressed(monkeypatch, fake_redis):
+    """
+    Tests that bodies above COMPRESSION_MIN_BYTES are sent in a negotiated content-coding.
+    """
+    from app.api.v1.endpoints import crop
+
+    monkeypatch.setattr(crop.settings, "COMPRESSION_MIN_BYTES", 0)
+    monkeypatch.setattr(crop.celery_app, "AsyncResult", lambda job_id: make_completed_task(get_completed_result()))
+
+    response = client.get("/api/v1/svg/some-job", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text.startswith("<svg")  # The test client transparently decodes gzip
+
+def test_sequence_status_streams_frames_since_index(monkeypatch, fake_redis):
+    """
+    Tests that a running sequence job returns only the frames published after `since`.
+    """
+    from app.api.v1.endpoints import crop
+    from app.services.cache_service import cache_service
+
+    for index in range(3):
+        cache_service.append_sequence_frame("seq-job", {
+            "index": index, "svg": "", "mask_contours": {}, "transform_reused": index > 0, "regions_recomputed": []
+        })
+
+    class RunningSequence:
+        state = "PROGRESS"
+        info = {"total_frames": 5, "completed_frames": 3}
+    monkeypatch.setattr(crop.celery_app, "AsyncResult", lambda job_id: RunningSequence())
+
+    response = client.get("/api/v1/sequence/status/seq-job", params={"since": 1})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "progress"
+    assert data["completed_frames"] == 3
+    assert [frame["index"] for frame in data["frames"]] == [1, 2]
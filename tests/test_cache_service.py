@@ -0,0 +1,29 @@
+from app.models.schemas import LandmarkPoint
+from app.services.cache_service import JobKeyBuilder
+
+IMAGE_B64 = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+
+
+def crop_key(image, landmarks):
+    return JobKeyBuilder("crop").add_image(image).add_landmarks(landmarks).add_image(image).job_id()
+
+def test_job_id_is_deterministic_for_decoded_inputs():
+    """
+    Tests that the same decoded inputs map to the same job ID, with or without a data URL prefix.
+    """
+    landmarks = [LandmarkPoint(x=1.0, y=2.0)]
+    job_id = crop_key(IMAGE_B64, landmarks)
+
+    assert job_id == crop_key(IMAGE_B64, landmarks)
+    assert job_id == crop_key("data:image/png;base64," + IMAGE_B64, landmarks)
+    assert len(job_id) == 36  # UUID-shaped, like the task IDs Celery generates
+
+def test_job_id_changes_with_inputs_and_job_type():
+    """
+    Tests that different landmarks or a different job type produce a different job ID.
+    """
+    landmarks = [LandmarkPoint(x=1.0, y=2.0)]
+    job_id = crop_key(IMAGE_B64, landmarks)
+
+    assert job_id != crop_key(IMAGE_B64, [LandmarkPoint(x=1.0, y=2.5)])
+    assert job_id != JobKeyBuilder("sequence").add_image(IMAGE_B64).add_landmarks(landmarks).add_image(IMAGE_B64).job_id()
@@ -0,0 +1,70 @@
+import math
+
+import cv2
+import numpy as np
+
+from app.utils.geometry_utils import (
+    ANCHOR_RANK, rank_from_levels, select_detail_level, simplify_ranked_contour
+)
+
+
+def make_circle(count=200, radius=50.0):
+    """Creates a closed circular contour as a list of point dicts."""
+    return [
+        {"x": radius * math.cos(2 * math.pi * i / count), "y": radius * math.sin(2 * math.pi * i / count)}
+        for i in range(count)
+    ]
+
+def rank_circle(contour, fractions=(0.001, 0.005, 0.02)):
+    """Ranks a contour from its approxPolyDP levels, as the worker does."""
+    points = np.array([[p["x"], p["y"]] for p in contour], dtype=np.float32).reshape(-1, 1, 2)
+    arc_length = cv2.arcLength(points, True)
+    index_of = {tuple(point): index for index, point in enumerate(points.reshape(-1, 2).tolist())}
+    levels = [
+        (fraction, [index_of[tuple(p)] for p in cv2.approxPolyDP(points, fraction * arc_length, True).reshape(-1, 2).tolist()])
+        for fraction in fractions
+    ]
+    order, ranks = rank_from_levels(levels)
+    return [contour[index] for index in order], ranks
+
+def test_rank_from_levels_reproduces_levels():
+    """
+    Tests that filtering by rank returns exactly the points kept at each level.
+    """
+    order, ranks = rank_from_levels([(0.02, [0, 4]), (0.001, [0, 1, 2, 3, 4]), (0.005, [0, 2, 4])])
+
+    assert order == [0, 1, 2, 3, 4]
+    assert ranks == [ANCHOR_RANK, 0.005, 0.02, 0.005, ANCHOR_RANK]
+
+def test_rank_from_levels_restricts_coarse_levels_to_finer_points():
+    """
+    Tests that a point kept by a coarse level but dropped by a finer one is not kept.
+    """
+    order, ranks = rank_from_levels([(0.001, [0, 1, 2]), (0.02, [0, 2, 3])])
+
+    assert order == [0, 1, 2]
+    assert ranks == [ANCHOR_RANK, 0.02, ANCHOR_RANK]
+
+def test_detail_levels_are_nested():
+    """
+    Tests that coarser levels keep a subset of the points kept by finer levels.
+    """
+    contour, ranks = rank_circle(make_circle())
+    coarse = simplify_ranked_contour(contour, ranks, 0.02)
+    default = simplify_ranked_contour(contour, ranks, 0.005)
+    fine = simplify_ranked_contour(contour, ranks, 0.001)
+
+    assert len(coarse) < len(default) < len(fine)
+    assert all(point in default for point in coarse)
+    assert all(point in fine for point in default)
+
+def test_select_detail_level_drops_degenerate_contours():
+    """
+    Tests that contours reduced to fewer than three points are dropped from a level.
+    """
+    square = [{"x": 0.0, "y": 0.0}, {"x": 10.0, "y": 0.0}, {"x": 10.0, "y": 10.0}, {"x": 0.0, "y": 10.0}]
+    contours = {"1": [square]}
+    ranks = {"1": [[ANCHOR_RANK, 0.1, ANCHOR_RANK, 0.1]]}
+
+    assert select_detail_level(contours, ranks, 0.05) == contours
+    assert select_detail_level(contours, ranks, 0.5) == {}
@@ -0,0 +1,33 @@
+from app.utils import http_utils
+from app.utils.http_utils import content_etag, encoded_etag, etag_matches, negotiate_encoding
+
+
+def test_negotiate_encoding_respects_preferences(monkeypatch):
+    """
+    Tests that Accept-Encoding quality values are honoured and brotli wins ties when available.
+    """
+    monkeypatch.setattr(http_utils, "brotli", object())
+    assert negotiate_encoding("gzip, deflate, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=0, gzip;q=0") == "identity"
+    assert negotiate_encoding(None) == "identity"
+
+def test_negotiate_encoding_without_brotli(monkeypatch):
+    """
+    Tests that gzip is used when the optional brotli package is not installed.
+    """
+    monkeypatch.setattr(http_utils, "brotli", None)
+    assert negotiate_encoding("br, gzip") == "gzip"
+    assert negotiate_encoding("br") == "identity"
+
+def test_etag_matches_any_representation():
+    """
+    Tests that If-None-Match matches the ETag of any content-coding of the same body.
+    """
+    etag = content_etag(b"{}")
+    assert etag_matches(etag, etag)
+    assert etag_matches(encoded_etag(etag, "gzip"), etag)
+    assert etag_matches('W/"other", ' + etag, etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(content_etag(b"[]"), etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,94 @@
+import base64
+import threading
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.core.celery_app import celery_app
+from app.workers import celery_worker, handoff
+from app.workers.signatures import face_segmentation_signature
+
+
+def encode_png(array):
+    buffer = BytesIO()
+    Image.fromarray(array).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+def make_job(job_id="job-1"):
+    """Creates a job with a blank image and a two-region segmentation map."""
+    image = np.zeros((120, 120, 3), dtype=np.uint8)
+    seg_map = np.zeros((120, 120, 3), dtype=np.uint8)
+    seg_map[20:60, 20:60] = 80
+    seg_map[70:110, 30:100] = 160
+    return {
+        "job_id": job_id,
+        "request": {"image": encode_png(image), "landmarks": [], "segmentation_map": encode_png(seg_map)}
+    }
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """Runs the stages against a temporary handoff directory without Redis or a real face."""
+    monkeypatch.setattr(celery_worker.settings, "PIPELINE_HANDOFF_DIR", str(tmp_path))
+    monkeypatch.setattr(celery_worker.settings, "LOAD_TEST_MODE", True)
+    monkeypatch.setattr(celery_worker.get_image_processor(), "validate_face_detection", lambda image: True)
+    monkeypatch.setattr(celery_worker.cache_service, "store_status_view", lambda *args: None)
+    monkeypatch.setattr(celery_worker.cache_service, "store_svg_view", lambda *args: None)
+    return tmp_path
+
+def test_staged_pipeline_produces_result_and_cleans_up(pipeline):
+    """
+    Tests that chaining the stages yields a complete result and removes the handoff artifacts.
+    """
+    job = make_job()
+    geometry = celery_worker.prepare_stage(job)
+    assert handoff.has_array("job-1", "cropped_seg_map")
+
+    result = celery_worker.render_stage(celery_worker.contours_stage(geometry))
+    assert set(result) == {"svg", "mask_contours", "image_shape", "contour_levels"}
+    assert len(result["mask_contours"]) == 2
+    assert not (pipeline / "job-1").exists()
+
+def test_completed_stages_are_not_rerun(pipeline, monkeypatch):
+    """
+    Tests that a retried or resubmitted job reuses the artifacts of stages that already finished.
+    """
+    job = make_job()
+    geometry = celery_worker.prepare_stage(job)
+    celery_worker.contours_stage(geometry)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("stage was recomputed")
+    monkeypatch.setattr(celery_worker.get_image_processor(), "decode_base64_image", fail)
+    monkeypatch.setattr(celery_worker.get_image_processor(), "extract_ranked_contours_from_segmentation", fail)
+
+    assert celery_worker.prepare_stage(job) == geometry
+    assert celery_worker.contours_stage(geometry) == geometry
+
+def test_stages_are_routed_to_separate_pools():
+    """
+    Tests that the chain ends in the render stage and that stages are routed to their pools.
+    """
+    signature = face_segmentation_signature(make_job())
+    names = [task.task for task in signature.tasks]
+    assert names[-1] == celery_worker.render_face_segmentation.name
+
+    routes = celery_app.conf.task_routes
+    assert routes[celery_worker.prepare_face_segmentation.name]["queue"] == "geometry"
+    assert routes[celery_worker.extract_face_contours.name]["queue"] == "contours"
+    assert routes[celery_worker.render_face_segmentation.name]["queue"] == "contours"
+    assert routes[celery_worker.process_face_sequence.name]["queue"] == "geometry"
+    assert routes[celery_worker.process_face_segmentation.name]["queue"] == "geometry"
+
+def test_each_thread_gets_its_own_image_processor():
+    """
+    Tests that threaded workers never share an ImageProcessor (its face cascade is not thread-safe).
+    """
+    processors = []
+    thread = threading.Thread(target=lambda: processors.append(celery_worker.get_image_processor()))
+    thread.start()
+    thread.join()
+
+    assert celery_worker.get_image_processor() is celery_worker.get_image_processor()
+    assert processors[0] is not celery_worker.get_image_processor()
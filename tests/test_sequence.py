@@ -0,0 +1,79 @@
+import numpy as np
+
+from app.models.schemas import LandmarkPoint
+from app.services.image_processor import ImageProcessor
+from app.services.sequence_processor import SequenceProcessor
+
+
+def make_segmentation_map():
+    """Creates a 200x200 map with two rectangular regions."""
+    seg_map = np.zeros((200, 200), dtype=np.uint8)
+    seg_map[40:100, 40:100] = 1
+    seg_map[120:180, 60:160] = 2
+    return seg_map
+
+def make_landmarks(dx=0.0):
+    """Creates a level 68-point landmark set, optionally shifted horizontally."""
+    landmarks = [LandmarkPoint(x=30 + (i % 10) * 15 + dx, y=30 + (i // 10) * 20) for i in range(68)]
+    for i in range(36, 48):  # Put both eyes on one line so no rotation is applied
+        landmarks[i] = LandmarkPoint(x=60 + (i - 36) * 8 + dx, y=80)
+    return landmarks
+
+def make_processor():
+    return SequenceProcessor(
+        ImageProcessor(), landmark_tolerance=2.0, change_threshold=0.02, angle_smoothing=0.5
+    )
+
+def test_first_frame_matches_single_image_pipeline():
+    """
+    Tests that the first frame of a sequence produces the same contours as a single-image job.
+    """
+    image_processor = ImageProcessor()
+    seg_map = make_segmentation_map()
+    landmarks = make_landmarks()
+
+    cropped_seg_map, _ = image_processor.crop_face_region(seg_map, landmarks)
+    expected = image_processor.extract_contours_from_segmentation(cropped_seg_map)
+
+    result = make_processor().process_frame(seg_map.shape, seg_map, landmarks)
+    assert result["mask_contours"] == expected
+    assert result["image_shape"] == cropped_seg_map.shape
+    assert result["transform_reused"] is False
+
+def test_unchanged_frame_reuses_transform_and_contours():
+    """
+    Tests that a frame within landmark tolerance and without label changes recomputes nothing.
+    """
+    processor = make_processor()
+    seg_map = make_segmentation_map()
+    first = processor.process_frame(seg_map.shape, seg_map, make_landmarks())
+    second = processor.process_frame(seg_map.shape, seg_map, make_landmarks(dx=1.0))
+
+    assert second["transform_reused"] is True
+    assert second["regions_recomputed"] == []
+    assert second["mask_contours"] == first["mask_contours"]
+
+def test_only_changed_regions_are_recomputed():
+    """
+    Tests that contours are recomputed only for the region whose pixels changed.
+    """
+    processor = make_processor()
+    seg_map = make_segmentation_map()
+    processor.process_frame(seg_map.shape, seg_map, make_landmarks())
+
+    changed = seg_map.copy()
+    changed[40:100, 100:130] = 1  # Grow region 1 by half its area
+    result = processor.process_frame(changed.shape, changed, make_landmarks())
+    assert result["regions_recomputed"] == ["1"]
+
+def test_landmark_drift_recomputes_transform():
+    """
+    Tests that moving landmarks beyond tolerance recomputes the transform and all regions.
+    """
+    processor = make_processor()
+    seg_map = make_segmentation_map()
+    processor.process_frame(seg_map.shape, seg_map, make_landmarks())
+    result = processor.process_frame(seg_map.shape, seg_map, make_landmarks(dx=10.0))
+
+    assert result["transform_reused"] is False
+    assert sorted(result["regions_recomputed"]) == ["1", "2"]
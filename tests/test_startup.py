@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+from startup_report import HEAVY_MODULES, parse_importtime
+
+
+def test_api_import_does_not_load_worker_stack():
+    """
+    Tests that importing the API (including the crop router) leaves OpenCV, SciPy and PIL unloaded.
+    """
+    probe = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    completed = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == ""
+
+def test_parse_importtime_keeps_top_level_packages():
+    """
+    Tests that the import-time parser ranks top-level packages by cumulative time.
+    """
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        150 |   fastapi.routing",
+        "import time:       200 |       5000 | fastapi",
+        "import time:        50 |        900 | rich",
+    ])
+    slowest = parse_importtime(stderr)
+    assert [entry["module"] for entry in slowest] == ["fastapi", "rich"]
+    assert slowest[0]["cumulative_ms"] == 5.0